@@ -2,8 +2,15 @@
 Módulo que implementa a árvore rubro-negra com persistência parcial.
 """
 
+from array import array
+from collections import OrderedDict
+
+from kernels import LIMITE_INT64, indice_sucessor
 from no import No, Cor
 
+# Letra de cada cor na saída de imprimir_arvore
+_COR_STR = {Cor.PRETO: 'N', Cor.VERMELHO: 'R'}
+
 class ArvoreRubroNegra:
     """
     Implementação de uma árvore rubro-negra com persistência parcial.
@@ -12,10 +19,32 @@ class ArvoreRubroNegra:
     permitindo acesso eficiente a estados anteriores.
     """
     
+    # Uma versão antiga de n nós é materializada depois de
+    # FATOR_MATERIALIZACAO * n / log2(n) consultas SUC respondidas nos nós:
+    # materializar custa O(n) e cada consulta feita nos arrays economiza uma
+    # fração de uma descida O(log n), então só antes desse ponto a
+    # materialização já se pagou
+    FATOR_MATERIALIZACAO = 16
+    # Número máximo de versões materializadas mantidas (as menos usadas saem)
+    LIMITE_INSTANTANEOS = 8
+    # Número máximo de versões com contagem de consultas mantida (as
+    # consultadas há mais tempo saem)
+    LIMITE_CONTAGENS = 1024
+    
     def __init__(self):
         """Inicializa uma árvore vazia."""
-        # Array para armazenar as raízes de cada versão (máximo 100 versões)
-        self.raizes = [None] * 100
+        # Lista com a raiz de cada versão (a versão 0 é a árvore vazia)
+        self.raizes = [None]
+        # Menor valor de cada versão, em paralelo a raizes (None se vazia)
+        self.minimos = [None]
+        # Número de nós de cada versão, em paralelo a raizes
+        self.tamanhos = [0]
+        # Versões antigas materializadas em arrays compactos, em ordem de uso (LRU)
+        self._instantaneos = OrderedDict()
+        # Consultas respondidas nos nós desde a última materialização de cada
+        # versão antiga, em ordem de uso (LRU); None marca versões que não
+        # podem ser materializadas
+        self._acessos = OrderedDict()
         self.versao_atual = 0
     
     def incluir(self, valor):
@@ -26,12 +55,20 @@ class ArvoreRubroNegra:
             valor (int): Valor a ser incluído
         """
         nova_versao = self.versao_atual + 1
-        nova_raiz = self._incluir_recursivo(self.raizes[self.versao_atual], valor, nova_versao)
+        nova_raiz, incluido = self._incluir_iterativo(
+            self.raizes[self.versao_atual], valor, nova_versao)
         
         if nova_raiz:
             nova_raiz.definir_cor(Cor.PRETO, nova_versao)
         
-        self.raizes[nova_versao] = nova_raiz
+        # O novo mínimo só muda se o valor incluído for menor que o anterior
+        minimo = self.minimos[self.versao_atual]
+        if minimo is None or valor < minimo:
+            minimo = valor
+        
+        self.raizes.append(nova_raiz)
+        self.minimos.append(minimo)
+        self.tamanhos.append(self.tamanhos[self.versao_atual] + incluido)
         self.versao_atual = nova_versao
     
     def remover(self, valor):
@@ -42,127 +79,197 @@ class ArvoreRubroNegra:
             valor (int): Valor a ser removido
         """
         nova_versao = self.versao_atual + 1
-        nova_raiz = self._remover_recursivo(self.raizes[self.versao_atual], valor, nova_versao)
-        
-        if nova_raiz:
-            nova_raiz.definir_cor(Cor.PRETO, nova_versao)
-        
-        self.raizes[nova_versao] = nova_raiz
+        nova_raiz, removido = self._remover_iterativo(
+            self.raizes[self.versao_atual], valor, nova_versao)
+        nova_raiz = self._balancear_apos_remocao(nova_raiz, nova_versao, eh_raiz=True)
+        
+        # O mínimo só precisa ser recalculado se foi ele o valor removido
+        minimo = self.minimos[self.versao_atual]
+        if minimo == valor:
+            no_minimo = self._encontrar_minimo(nova_raiz, nova_versao)
+            minimo = no_minimo.valor if no_minimo else None
+        
+        self.raizes.append(nova_raiz)
+        self.minimos.append(minimo)
+        self.tamanhos.append(self.tamanhos[self.versao_atual] - removido)
         self.versao_atual = nova_versao
     
-    def buscar_sucessor(self, valor, versao=None):
+    def buscar_sucessor(self, valor, versao=-1):
         """
         Busca o sucessor de um valor na árvore.
         
         Args:
             valor (int): Valor de referência
-            versao (int, opcional): Versão da árvore (padrão: versão atual)
+            versao (int, opcional): Versão da árvore; None ou valores fora
+                de [0, versao_atual] indicam a versão atual (padrão: -1)
             
         Returns:
             int ou None: Sucessor do valor ou None se não existir
         """
-        if versao is None or versao > self.versao_atual:
-            versao = self.versao_atual
+        versao = self.resolver_versao(versao)
+        
+        # Valores menores que o mínimo da versão têm o próprio mínimo como sucessor
+        minimo = self.minimos[versao]
+        if minimo is None or valor < minimo:
+            return minimo
+        
+        # Versões antigas não mudam mais e podem ser consultadas em forma compacta
+        if versao < self.versao_atual:
+            instantaneo = self._obter_instantaneo(versao)
+            if instantaneo is not None:
+                return self._buscar_sucessor_instantaneo(instantaneo, valor)
         
-        raiz = self.raizes[versao]
         sucessor = None
-        atual = raiz
+        atual = self.raizes[versao]
         
-        while atual and atual.esta_ativo(versao):
-            if atual.valor > valor:
-                sucessor = atual.valor
+        while atual is not None and atual.versao_criacao <= versao < atual.versao_fim:
+            valor_atual = atual.valor
+            if valor_atual > valor:
+                sucessor = valor_atual
                 atual = atual.obter_filho_esquerdo(versao)
             else:
                 atual = atual.obter_filho_direito(versao)
         
         return sucessor
     
-    def imprimir_arvore(self, versao=None):
+    def imprimir_arvore(self, versao=-1):
         """
         Imprime a árvore em ordem crescente com profundidade e cor.
         
         Args:
-            versao (int, opcional): Versão da árvore (padrão: versão atual)
+            versao (int, opcional): Versão da árvore; None ou valores fora
+                de [0, versao_atual] indicam a versão atual (padrão: -1)
             
         Returns:
             list: Lista de strings no formato "valor,profundidade,cor"
         """
-        if versao is None or versao > self.versao_atual:
-            versao = self.versao_atual
+        return list(self.imprimir_arvore_iter(versao))
+    
+    def imprimir_arvore_iter(self, versao=-1):
+        """
+        Gera os elementos da árvore em ordem crescente com profundidade e cor.
         
-        resultado = []
-        raiz = self.raizes[versao]
+        Equivalente a imprimir_arvore, mas produz um elemento por vez, sem
+        montar a lista inteira (útil para gravar versões grandes diretamente).
         
-        if raiz:
-            self._percorrer_em_ordem(raiz, versao, 0, resultado)
+        Args:
+            versao (int, opcional): Versão da árvore; None ou valores fora
+                de [0, versao_atual] indicam a versão atual (padrão: -1)
+            
+        Returns:
+            iterator: Elementos no formato "valor,profundidade,cor"
+        """
+        # A versão é resolvida já na chamada, e não na primeira iteração
+        versao = self.resolver_versao(versao)
         
-        return resultado
+        return self._percorrer_em_ordem(self.raizes[versao], versao, 0)
     
-    def _incluir_recursivo(self, no, valor, versao):
+    def resolver_versao(self, versao):
         """
-        Inclui um valor recursivamente na árvore.
+        Obtém a versão efetivamente consultada para uma versão pedida.
+        
+        Args:
+            versao (int ou None): Versão pedida
+            
+        Returns:
+            int: A própria versão, se estiver em [0, versao_atual], ou a
+            versão atual caso contrário (inclusive para None)
+        """
+        if versao is None or not 0 <= versao <= self.versao_atual:
+            return self.versao_atual
+        return versao
+    
+    def _incluir_iterativo(self, raiz, valor, versao):
+        """
+        Inclui um valor na árvore sem recursão.
+        
+        A descida registra o caminho até a posição de inserção; a subida
+        percorre esse caminho de volta religando e balanceando cada ancestral.
         
         Args:
-            no (No ou None): Nó atual
+            raiz (No ou None): Raiz da versão anterior
             valor (int): Valor a incluir
             versao (int): Versão da operação
             
         Returns:
-            No: Novo nó raiz da subárvore
+            tuple: Nova raiz da árvore e se um nó foi criado (False se o
+            valor já existia)
         """
-        if no is None:
-            return No(valor, Cor.VERMELHO, versao)
-        
-        # Criar uma nova versão do nó se necessário
-        if not no.esta_ativo(versao):
-            return No(valor, Cor.VERMELHO, versao)
-        
-        if valor < no.valor:
-            filho_esquerdo = self._incluir_recursivo(no.obter_filho_esquerdo(versao), valor, versao)
-            no.definir_filho_esquerdo(filho_esquerdo, versao)
-            if filho_esquerdo:
-                filho_esquerdo.definir_pai(no, versao)
-        elif valor > no.valor:
-            filho_direito = self._incluir_recursivo(no.obter_filho_direito(versao), valor, versao)
-            no.definir_filho_direito(filho_direito, versao)
-            if filho_direito:
-                filho_direito.definir_pai(no, versao)
+        caminho = []
+        no = raiz
+        incluido = False
+        
+        while no is not None and no.versao_criacao <= versao < no.versao_fim:
+            if valor < no.valor:
+                caminho.append((no, True))
+                no = no.obter_filho_esquerdo(versao)
+            elif valor > no.valor:
+                caminho.append((no, False))
+                no = no.obter_filho_direito(versao)
+            else:
+                # Valor já existe: nenhum nó é criado, mas os ancestrais
+                # ainda são balanceados na subida
+                break
         else:
-            # Valor já existe, não faz nada
-            return no
+            no = No(valor, Cor.VERMELHO, versao)
+            incluido = True
         
-        return self._balancear_apos_inclusao(no, versao)
+        nova_raiz = self._religar_caminho(caminho, no, versao, self._balancear_apos_inclusao)
+        return nova_raiz, incluido
     
-    def _remover_recursivo(self, no, valor, versao):
+    def _remover_iterativo(self, raiz, valor, versao):
         """
-        Remove um valor recursivamente da árvore.
+        Remove um valor da árvore sem recursão.
         
         Args:
-            no (No ou None): Nó atual
+            raiz (No ou None): Raiz da versão anterior
             valor (int): Valor a remover
             versao (int): Versão da operação
             
         Returns:
-            No ou None: Novo nó raiz da subárvore
-        """
-        if no is None or not no.esta_ativo(versao):
-            return no
-        
-        if valor < no.valor:
-            filho_esquerdo = self._remover_recursivo(no.obter_filho_esquerdo(versao), valor, versao)
-            no.definir_filho_esquerdo(filho_esquerdo, versao)
-            if filho_esquerdo:
-                filho_esquerdo.definir_pai(no, versao)
-        elif valor > no.valor:
-            filho_direito = self._remover_recursivo(no.obter_filho_direito(versao), valor, versao)
-            no.definir_filho_direito(filho_direito, versao)
-            if filho_direito:
-                filho_direito.definir_pai(no, versao)
-        else:
-            # Nó encontrado, remover
-            return self._remover_no(no, versao)
+            tuple: Nova raiz da árvore (ou None) e se um nó foi removido
+        """
+        caminho = []
+        no = raiz
+        
+        while no is not None and no.versao_criacao <= versao < no.versao_fim:
+            if valor < no.valor:
+                caminho.append((no, True))
+                no = no.obter_filho_esquerdo(versao)
+            elif valor > no.valor:
+                caminho.append((no, False))
+                no = no.obter_filho_direito(versao)
+            else:
+                # Nó encontrado, remover
+                substituto = self._remover_no(no, versao)
+                nova_raiz = self._religar_caminho(
+                    caminho, substituto, versao, self._balancear_apos_remocao)
+                return nova_raiz, True
+        
+        # Valor não encontrado, a árvore não muda
+        return raiz, False
+    
+    def _religar_caminho(self, caminho, subarvore, versao, balancear):
+        """
+        Percorre um caminho de volta à raiz religando e balanceando os ancestrais.
+        
+        Args:
+            caminho (list): Pares (ancestral, lado_esquerdo) da raiz até o ponto alterado
+            subarvore (No ou None): Nova subárvore no ponto alterado
+            versao (int): Versão da operação
+            balancear (callable): Função de balanceamento aplicada a cada ancestral
+            
+        Returns:
+            No ou None: Nova raiz do caminho
+        """
+        for ancestral, lado_esquerdo in reversed(caminho):
+            if lado_esquerdo:
+                ancestral.definir_filho_esquerdo(subarvore, versao)
+            else:
+                ancestral.definir_filho_direito(subarvore, versao)
+            subarvore = balancear(ancestral, versao)
         
-        return self._balancear_apos_remocao(no, versao)
+        return subarvore
     
     def _remover_no(self, no, versao):
         """
@@ -175,8 +282,7 @@ class ArvoreRubroNegra:
         Returns:
             No ou None: Nó substituto
         """
-        filho_esquerdo = no.obter_filho_esquerdo(versao)
-        filho_direito = no.obter_filho_direito(versao)
+        filho_esquerdo, filho_direito = no.obter_ambos_filhos(versao)
         
         # Caso 1: Nó sem filhos ou com apenas um filho
         if filho_esquerdo is None:
@@ -187,19 +293,29 @@ class ArvoreRubroNegra:
             return filho_esquerdo
         
         # Caso 2: Nó com dois filhos
-        # Encontrar o sucessor (menor valor na subárvore direita)
-        sucessor = self._encontrar_minimo(filho_direito, versao)
-        
-        # Substituir o valor do nó pelo valor do sucessor
-        no.valor = sucessor.valor
-        
-        # Remover o sucessor da subárvore direita
-        nova_subarvore_direita = self._remover_recursivo(filho_direito, sucessor.valor, versao)
-        no.definir_filho_direito(nova_subarvore_direita, versao)
-        if nova_subarvore_direita:
-            nova_subarvore_direita.definir_pai(no, versao)
-        
-        return no
+        # Descer pela espinha esquerda da subárvore direita até o sucessor
+        caminho = []
+        sucessor = filho_direito
+        while True:
+            esquerdo_sucessor = sucessor.obter_filho_esquerdo(versao)
+            if (esquerdo_sucessor is None
+                    or not esquerdo_sucessor.versao_criacao <= versao < esquerdo_sucessor.versao_fim):
+                break
+            caminho.append((sucessor, True))
+            sucessor = esquerdo_sucessor
+        
+        # Remover o sucessor da subárvore direita (ele não tem filho esquerdo)
+        sucessor.remover(versao)
+        nova_subarvore_direita = self._religar_caminho(
+            caminho, sucessor.obter_filho_direito(versao), versao, self._balancear_apos_remocao)
+        
+        # Um novo nó com o valor do sucessor ocupa o lugar do nó removido.
+        # O valor do nó original não é sobrescrito, preservando as versões anteriores.
+        substituto = No(sucessor.valor, no.obter_cor(versao), versao)
+        substituto.definir_filhos(filho_esquerdo, nova_subarvore_direita, versao)
+        no.remover(versao)
+        
+        return substituto
     
     def _encontrar_minimo(self, no, versao):
         """
@@ -212,8 +328,12 @@ class ArvoreRubroNegra:
         Returns:
             No: Nó com valor mínimo
         """
-        while no and no.obter_filho_esquerdo(versao) and no.obter_filho_esquerdo(versao).esta_ativo(versao):
-            no = no.obter_filho_esquerdo(versao)
+        while no:
+            filho_esquerdo = no.obter_filho_esquerdo(versao)
+            if (filho_esquerdo is None
+                    or not filho_esquerdo.versao_criacao <= versao < filho_esquerdo.versao_fim):
+                break
+            no = filho_esquerdo
         return no
     
     def _balancear_apos_inclusao(self, no, versao):
@@ -228,13 +348,13 @@ class ArvoreRubroNegra:
             No: Nova raiz da subárvore
         """
         # Caso 1: Verificar violação vermelho-vermelho
-        filho_esquerdo = no.obter_filho_esquerdo(versao)
-        filho_direito = no.obter_filho_direito(versao)
+        # Os filhos de cada nó são lidos com uma única consulta, e os netos só
+        # quando o filho correspondente é vermelho
+        filho_esquerdo, filho_direito = no.obter_ambos_filhos(versao)
         
         # Balanceamento baseado nos padrões de Okasaki
         if (filho_esquerdo and filho_esquerdo.obter_cor(versao) == Cor.VERMELHO):
-            neto_esq_esq = filho_esquerdo.obter_filho_esquerdo(versao)
-            neto_esq_dir = filho_esquerdo.obter_filho_direito(versao)
+            neto_esq_esq, neto_esq_dir = filho_esquerdo.obter_ambos_filhos(versao)
             
             # Caso: nó preto com filho esquerdo vermelho e neto esquerdo vermelho
             if (neto_esq_esq and neto_esq_esq.obter_cor(versao) == Cor.VERMELHO):
@@ -245,8 +365,7 @@ class ArvoreRubroNegra:
                 return self._balancear_caso_esquerda_direita(no, versao)
         
         if (filho_direito and filho_direito.obter_cor(versao) == Cor.VERMELHO):
-            neto_dir_esq = filho_direito.obter_filho_esquerdo(versao)
-            neto_dir_dir = filho_direito.obter_filho_direito(versao)
+            neto_dir_esq, neto_dir_dir = filho_direito.obter_ambos_filhos(versao)
             
             # Caso: nó preto com filho direito vermelho e neto esquerdo vermelho
             if (neto_dir_esq and neto_dir_esq.obter_cor(versao) == Cor.VERMELHO):
@@ -260,115 +379,62 @@ class ArvoreRubroNegra:
     
     def _balancear_caso_esquerda_esquerda(self, no, versao):
         """Balanceia o caso esquerda-esquerda (rotação à direita)."""
-        filho_esquerdo = no.obter_filho_esquerdo(versao)
-        neto_esq_esq = filho_esquerdo.obter_filho_esquerdo(versao)
-        neto_esq_dir = filho_esquerdo.obter_filho_direito(versao)
-        filho_direito = no.obter_filho_direito(versao)
+        filho_esquerdo, filho_direito = no.obter_ambos_filhos(versao)
+        neto_esq_esq, neto_esq_dir = filho_esquerdo.obter_ambos_filhos(versao)
         
-        # Reconfigurar a árvore
-        filho_esquerdo.definir_cor(Cor.VERMELHO, versao)
+        # Reconfigurar cores e filhos (uma única atualização por nó)
+        filho_esquerdo.religar(versao, cor=Cor.VERMELHO, esquerdo=neto_esq_esq, direito=no)
+        no.religar(versao, cor=Cor.PRETO, esquerdo=neto_esq_dir, direito=filho_direito)
         neto_esq_esq.definir_cor(Cor.PRETO, versao)
-        no.definir_cor(Cor.PRETO, versao)
-        
-        # Reorganizar nós
-        filho_esquerdo.definir_filhos(neto_esq_esq, no, versao)
-        no.definir_filhos(neto_esq_dir, filho_direito, versao)
-        
-        # Atualizar pais
-        if neto_esq_dir:
-            neto_esq_dir.definir_pai(no, versao)
-        no.definir_pai(filho_esquerdo, versao)
-        neto_esq_esq.definir_pai(filho_esquerdo, versao)
         
         return filho_esquerdo
     
     def _balancear_caso_esquerda_direita(self, no, versao):
         """Balanceia o caso esquerda-direita (rotação dupla)."""
-        filho_esquerdo = no.obter_filho_esquerdo(versao)
-        neto_esq_dir = filho_esquerdo.obter_filho_direito(versao)
-        bisneto_esq = neto_esq_dir.obter_filho_esquerdo(versao)
-        bisneto_dir = neto_esq_dir.obter_filho_direito(versao)
-        filho_direito = no.obter_filho_direito(versao)
-        
-        # Reconfigurar cores
-        neto_esq_dir.definir_cor(Cor.VERMELHO, versao)
-        filho_esquerdo.definir_cor(Cor.PRETO, versao)
-        no.definir_cor(Cor.PRETO, versao)
-        
-        # Reorganizar nós
-        neto_esq_dir.definir_filhos(filho_esquerdo, no, versao)
-        filho_esquerdo.definir_filhos(filho_esquerdo.obter_filho_esquerdo(versao), bisneto_esq, versao)
-        no.definir_filhos(bisneto_dir, filho_direito, versao)
-        
-        # Atualizar pais
-        if bisneto_esq:
-            bisneto_esq.definir_pai(filho_esquerdo, versao)
-        if bisneto_dir:
-            bisneto_dir.definir_pai(no, versao)
-        filho_esquerdo.definir_pai(neto_esq_dir, versao)
-        no.definir_pai(neto_esq_dir, versao)
+        filho_esquerdo, filho_direito = no.obter_ambos_filhos(versao)
+        neto_esq_esq, neto_esq_dir = filho_esquerdo.obter_ambos_filhos(versao)
+        bisneto_esq, bisneto_dir = neto_esq_dir.obter_ambos_filhos(versao)
+        
+        # Reconfigurar cores e filhos (uma única atualização por nó)
+        neto_esq_dir.religar(versao, cor=Cor.VERMELHO, esquerdo=filho_esquerdo, direito=no)
+        filho_esquerdo.religar(versao, cor=Cor.PRETO, esquerdo=neto_esq_esq, direito=bisneto_esq)
+        no.religar(versao, cor=Cor.PRETO, esquerdo=bisneto_dir, direito=filho_direito)
         
         return neto_esq_dir
     
     def _balancear_caso_direita_esquerda(self, no, versao):
         """Balanceia o caso direita-esquerda (rotação dupla)."""
-        filho_direito = no.obter_filho_direito(versao)
-        neto_dir_esq = filho_direito.obter_filho_esquerdo(versao)
-        bisneto_esq = neto_dir_esq.obter_filho_esquerdo(versao)
-        bisneto_dir = neto_dir_esq.obter_filho_direito(versao)
-        filho_esquerdo = no.obter_filho_esquerdo(versao)
-        
-        # Reconfigurar cores
-        neto_dir_esq.definir_cor(Cor.VERMELHO, versao)
-        no.definir_cor(Cor.PRETO, versao)
-        filho_direito.definir_cor(Cor.PRETO, versao)
-        
-        # Reorganizar nós
-        neto_dir_esq.definir_filhos(no, filho_direito, versao)
-        no.definir_filhos(filho_esquerdo, bisneto_esq, versao)
-        filho_direito.definir_filhos(bisneto_dir, filho_direito.obter_filho_direito(versao), versao)
-        
-        # Atualizar pais
-        if bisneto_esq:
-            bisneto_esq.definir_pai(no, versao)
-        if bisneto_dir:
-            bisneto_dir.definir_pai(filho_direito, versao)
-        no.definir_pai(neto_dir_esq, versao)
-        filho_direito.definir_pai(neto_dir_esq, versao)
+        filho_esquerdo, filho_direito = no.obter_ambos_filhos(versao)
+        neto_dir_esq, neto_dir_dir = filho_direito.obter_ambos_filhos(versao)
+        bisneto_esq, bisneto_dir = neto_dir_esq.obter_ambos_filhos(versao)
+        
+        # Reconfigurar cores e filhos (uma única atualização por nó)
+        neto_dir_esq.religar(versao, cor=Cor.VERMELHO, esquerdo=no, direito=filho_direito)
+        no.religar(versao, cor=Cor.PRETO, esquerdo=filho_esquerdo, direito=bisneto_esq)
+        filho_direito.religar(versao, cor=Cor.PRETO, esquerdo=bisneto_dir, direito=neto_dir_dir)
         
         return neto_dir_esq
     
     def _balancear_caso_direita_direita(self, no, versao):
         """Balanceia o caso direita-direita (rotação à esquerda)."""
-        filho_direito = no.obter_filho_direito(versao)
-        neto_dir_dir = filho_direito.obter_filho_direito(versao)
-        neto_dir_esq = filho_direito.obter_filho_esquerdo(versao)
-        filho_esquerdo = no.obter_filho_esquerdo(versao)
-        
-        # Reconfigurar cores
-        filho_direito.definir_cor(Cor.VERMELHO, versao)
-        no.definir_cor(Cor.PRETO, versao)
-        neto_dir_dir.definir_cor(Cor.PRETO, versao)
+        filho_esquerdo, filho_direito = no.obter_ambos_filhos(versao)
+        neto_dir_esq, neto_dir_dir = filho_direito.obter_ambos_filhos(versao)
         
-        # Reorganizar nós
-        filho_direito.definir_filhos(no, neto_dir_dir, versao)
-        no.definir_filhos(filho_esquerdo, neto_dir_esq, versao)
-        
-        # Atualizar pais
-        if neto_dir_esq:
-            neto_dir_esq.definir_pai(no, versao)
-        no.definir_pai(filho_direito, versao)
-        neto_dir_dir.definir_pai(filho_direito, versao)
+        # Reconfigurar cores e filhos (uma única atualização por nó)
+        filho_direito.religar(versao, cor=Cor.VERMELHO, esquerdo=no, direito=neto_dir_dir)
+        no.religar(versao, cor=Cor.PRETO, esquerdo=filho_esquerdo, direito=neto_dir_esq)
+        neto_dir_dir.definir_cor(Cor.PRETO, versao)
         
         return filho_direito
     
-    def _balancear_apos_remocao(self, no, versao):
+    def _balancear_apos_remocao(self, no, versao, eh_raiz=False):
         """
         Balanceia a árvore após uma remoção seguindo as regras rubro-negras.
         
         Args:
             no (No): Nó a verificar
             versao (int): Versão da operação
+            eh_raiz (bool): Se o nó é a raiz da árvore
             
         Returns:
             No: Nova raiz da subárvore
@@ -378,15 +444,16 @@ class ArvoreRubroNegra:
         
         # Verificar se há violação das propriedades rubro-negras
         # e aplicar as correções necessárias
-        return self._corrigir_violacoes_remocao(no, versao)
+        return self._corrigir_violacoes_remocao(no, versao, eh_raiz)
     
-    def _corrigir_violacoes_remocao(self, no, versao):
+    def _corrigir_violacoes_remocao(self, no, versao, eh_raiz):
         """
         Corrige violações das propriedades rubro-negras após remoção.
         
         Args:
             no (No): Nó atual
             versao (int): Versão da operação
+            eh_raiz (bool): Se o nó é a raiz da árvore
             
         Returns:
             No: Nova raiz da subárvore
@@ -397,86 +464,216 @@ class ArvoreRubroNegra:
         # irmão preto com filhos vermelhos, etc.)
         
         # Por enquanto, apenas garantir que a raiz seja preta
-        if no and no.obter_pai(versao) is None:
+        if eh_raiz:
             no.definir_cor(Cor.PRETO, versao)
         
         return no
     
-    def _rotacao_esquerda(self, no, versao):
+    def _percorrer_em_ordem(self, no, versao, profundidade):
         """
-        Executa rotação à esquerda.
+        Percorre a árvore em ordem, gerando os nós ativos formatados.
+        
+        O percurso é iterativo, com uma pilha explícita de pares
+        (nó, profundidade), evitando uma chamada recursiva por nó.
         
         Args:
-            no (No): Nó para rotacionar
-            versao (int): Versão da operação
+            no (No): Nó inicial
+            versao (int): Versão da consulta
+            profundidade (int): Profundidade do nó inicial
+            
+        Yields:
+            str: Elemento no formato "valor,profundidade,cor"
+        """
+        pilha = []
+        
+        while True:
+            # Descer pela subárvore esquerda empilhando os nós ativos
+            while no is not None and no.versao_criacao <= versao < no.versao_fim:
+                pilha.append((no, profundidade))
+                no = no.obter_filho_esquerdo(versao)
+                profundidade += 1
+            
+            if not pilha:
+                break
+            
+            # Visitar nó atual
+            no, profundidade = pilha.pop()
+            yield f"{no.valor},{profundidade},{_COR_STR[no.obter_cor(versao)]}"
+            
+            # Continuar pela subárvore direita
+            no = no.obter_filho_direito(versao)
+            profundidade += 1
+    
+    def _obter_instantaneo(self, versao):
+        """
+        Obtém a versão materializada, materializando-a se for consultada com frequência.
+        
+        Uma versão só é materializada depois de _limiar_materializacao(versao)
+        consultas respondidas nos nós, para que o custo O(n) da materialização
+        nunca supere o das descidas que ela substitui. São mantidas no máximo
+        LIMITE_INSTANTANEOS versões, descartando a usada há mais tempo.
+        
+        Args:
+            versao (int): Versão antiga da árvore
             
         Returns:
-            No: Nova raiz após rotação
+            tuple ou None: Arrays da versão, ou None se ela deve ser consultada nos nós
         """
-        filho_direito = no.obter_filho_direito(versao)
-        if filho_direito is None:
-            return no
+        instantaneo = self._instantaneos.get(versao)
+        if instantaneo is not None:
+            self._instantaneos.move_to_end(versao)
+            return instantaneo
+        
+        acessos = self._acessos.get(versao, 0)
+        if acessos is None:
+            self._acessos.move_to_end(versao)
+            return None
         
-        # Atualizar conexões
-        no.definir_filho_direito(filho_direito.obter_filho_esquerdo(versao), versao)
-        if filho_direito.obter_filho_esquerdo(versao):
-            filho_direito.obter_filho_esquerdo(versao).definir_pai(no, versao)
+        # Cada materialização consome o limiar de consultas que a pagou; a
+        # contagem não é apagada quando a versão é descartada de
+        # _instantaneos, então uma versão descartada só volta a ser
+        # materializada depois de outras tantas consultas nos nós
+        acessos += 1
+        limiar = self._limiar_materializacao(versao)
+        if acessos < limiar:
+            self._registrar_acessos(versao, acessos)
+            return None
+        
+        instantaneo = self._materializar(versao)
+        if instantaneo is None:
+            self._registrar_acessos(versao, None)
+            return None
         
-        filho_direito.definir_filho_esquerdo(no, versao)
-        filho_direito.definir_pai(no.obter_pai(versao), versao)
-        no.definir_pai(filho_direito, versao)
+        self._registrar_acessos(versao, acessos - limiar)
+        self._instantaneos[versao] = instantaneo
+        if len(self._instantaneos) > self.LIMITE_INSTANTANEOS:
+            self._instantaneos.popitem(last=False)
         
-        return filho_direito
+        return instantaneo
     
-    def _rotacao_direita(self, no, versao):
+    def _registrar_acessos(self, versao, acessos):
         """
-        Executa rotação à direita.
+        Registra a contagem de consultas de uma versão antiga.
+        
+        São mantidas no máximo LIMITE_CONTAGENS contagens, descartando a da
+        versão consultada há mais tempo.
         
         Args:
-            no (No): Nó para rotacionar
-            versao (int): Versão da operação
+            versao (int): Versão antiga da árvore
+            acessos (int ou None): Consultas nos nós desde a última
+                materialização, ou None se a versão não pode ser materializada
+        """
+        self._acessos[versao] = acessos
+        self._acessos.move_to_end(versao)
+        if len(self._acessos) > self.LIMITE_CONTAGENS:
+            self._acessos.popitem(last=False)
+    
+    def _limiar_materializacao(self, versao):
+        """
+        Obtém o número de consultas a partir do qual uma versão é materializada.
+        
+        Args:
+            versao (int): Versão antiga da árvore
             
         Returns:
-            No: Nova raiz após rotação
+            int: FATOR_MATERIALIZACAO * n / log2(n), sendo n o número de nós da versão
         """
-        filho_esquerdo = no.obter_filho_esquerdo(versao)
-        if filho_esquerdo is None:
-            return no
+        tamanho = self.tamanhos[versao]
+        return self.FATOR_MATERIALIZACAO * tamanho // max(1, tamanho.bit_length())
+    
+    def _buscar_sucessor_instantaneo(self, instantaneo, valor):
+        """
+        Busca o sucessor de um valor em uma versão materializada.
         
-        # Atualizar conexões
-        no.definir_filho_esquerdo(filho_esquerdo.obter_filho_direito(versao), versao)
-        if filho_esquerdo.obter_filho_direito(versao):
-            filho_esquerdo.obter_filho_direito(versao).definir_pai(no, versao)
+        Args:
+            instantaneo (tuple): Arrays (valores, esquerdos, direitos) da versão
+            valor (int): Valor de referência
+            
+        Returns:
+            int ou None: Sucessor do valor ou None se não existir
+        """
+        # Todos os valores materializados são menores que LIMITE_INT64
+        if valor >= LIMITE_INT64:
+            return None
+        
+        valores, esquerdos, direitos = instantaneo
+        indice = indice_sucessor(valores, esquerdos, direitos, valor)
+        return valores[indice] if indice >= 0 else None
+    
+    def _materializar(self, versao):
+        """
+        Materializa uma versão em arrays compactos dispostos em layout van Emde Boas.
         
-        filho_esquerdo.definir_filho_direito(no, versao)
-        filho_esquerdo.definir_pai(no.obter_pai(versao), versao)
-        no.definir_pai(filho_esquerdo, versao)
+        Cada nó ativo da versão recebe um índice; os arrays guardam o valor e os
+        índices dos filhos (-1 para ausente). A ordem dos índices segue o layout
+        van Emde Boas, em que cada subárvore de altura h ocupa posições contíguas,
+        de modo que uma descida da raiz a uma folha toca poucos blocos de memória.
         
-        return filho_esquerdo
+        Args:
+            versao (int): Versão a materializar
+            
+        Returns:
+            tuple ou None: Arrays (valores, esquerdos, direitos), ou None se a versão
+            estiver vazia ou tiver valores que não cabem em 64 bits
+        """
+        raiz = self.raizes[versao]
+        if raiz is None:
+            return None
+        
+        # Coletar os filhos ativos de cada nó e a altura da versão
+        filhos = {}
+        altura = 0
+        pilha = [(raiz, 1)]
+        while pilha:
+            no, profundidade = pilha.pop()
+            altura = max(altura, profundidade)
+            par = []
+            for filho in no.obter_ambos_filhos(versao):
+                if filho is not None and filho.versao_criacao <= versao < filho.versao_fim:
+                    pilha.append((filho, profundidade + 1))
+                    par.append(filho)
+                else:
+                    par.append(None)
+            filhos[no] = par
+        
+        ordem = []
+        self._ordem_veb(raiz, altura, filhos, ordem)
+        indices = {no: indice for indice, no in enumerate(ordem)}
+        
+        try:
+            valores = array('q', (no.valor for no in ordem))
+        except OverflowError:
+            return None
+        esquerdos = array('i', (indices.get(filhos[no][0], -1) for no in ordem))
+        direitos = array('i', (indices.get(filhos[no][1], -1) for no in ordem))
+        
+        return (valores, esquerdos, direitos)
     
-    def _percorrer_em_ordem(self, no, versao, profundidade, resultado):
+    def _ordem_veb(self, no, altura, filhos, ordem):
         """
-        Percorre a árvore em ordem, coletando os nós ativos.
+        Acrescenta a ordem van Emde Boas de uma subárvore truncada na altura dada.
+        
+        A subárvore é dividida em uma árvore de topo com metade da altura, disposta
+        primeiro, seguida das subárvores de base penduradas nela, da esquerda para
+        a direita, cada uma disposta recursivamente da mesma forma.
         
         Args:
-            no (No): Nó atual
-            versao (int): Versão da consulta
-            profundidade (int): Profundidade atual
-            resultado (list): Lista para armazenar o resultado
+            no (No): Raiz da subárvore
+            altura (int): Número de níveis considerados a partir de no
+            filhos (dict): Filhos ativos [esquerdo, direito] de cada nó
+            ordem (list): Lista que recebe os nós na ordem do layout
         """
-        if no is None or not no.esta_ativo(versao):
+        if altura == 1:
+            ordem.append(no)
             return
         
-        # Percorrer subárvore esquerda
-        filho_esquerdo = no.obter_filho_esquerdo(versao)
-        if filho_esquerdo:
-            self._percorrer_em_ordem(filho_esquerdo, versao, profundidade + 1, resultado)
+        altura_topo = altura // 2
+        self._ordem_veb(no, altura_topo, filhos, ordem)
         
-        # Visitar nó atual
-        cor_str = no.obter_cor(versao).value
-        resultado.append(f"{no.valor},{profundidade},{cor_str}")
+        # Raízes das subárvores de base: nós na profundidade altura_topo
+        nivel = [no]
+        for _ in range(altura_topo):
+            nivel = [filho for pai in nivel for filho in filhos[pai] if filho is not None]
         
-        # Percorrer subárvore direita
-        filho_direito = no.obter_filho_direito(versao)
-        if filho_direito:
-            self._percorrer_em_ordem(filho_direito, versao, profundidade + 1, resultado)
\ No newline at end of file
+        for raiz_base in nivel:
+            self._ordem_veb(raiz_base, altura - altura_topo, filhos, ordem)
@@ -0,0 +1,48 @@
+"""
+Módulo com as rotinas de busca sobre versões materializadas da árvore.
+
+As rotinas operam apenas sobre arrays de inteiros, sem objetos Python. Quando o
+Numba está instalado elas são compiladas para código de máquina; caso contrário
+são executadas normalmente como Python puro.
+"""
+
+try:
+    from numba import njit
+    NUMBA_DISPONIVEL = True
+except ImportError:
+    NUMBA_DISPONIVEL = False
+    
+    def njit(*args, **kwargs):
+        """Substituto de numba.njit que devolve a função sem compilá-la."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda funcao: funcao
+
+# Os valores materializados cabem em 64 bits com sinal
+LIMITE_INT64 = 1 << 63
+
+@njit(cache=True)
+def indice_sucessor(valores, esquerdos, direitos, valor):
+    """
+    Busca o índice do sucessor de um valor em uma versão materializada.
+    
+    Args:
+        valores (array): Valor de cada nó
+        esquerdos (array): Índice do filho esquerdo de cada nó (-1 se ausente)
+        direitos (array): Índice do filho direito de cada nó (-1 se ausente)
+        valor (int): Valor de referência
+        
+    Returns:
+        int: Índice do nó sucessor, ou -1 se não existir
+    """
+    sucessor = -1
+    indice = 0
+    
+    while indice >= 0:
+        if valores[indice] > valor:
+            sucessor = indice
+            indice = esquerdos[indice]
+        else:
+            indice = direitos[indice]
+    
+    return sucessor
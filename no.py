@@ -2,12 +2,18 @@
 Módulo que define a classe Nó para a árvore rubro-negra com persistência parcial.
 """
 
-from enum import Enum
+import sys
+from bisect import bisect_right
+from enum import IntEnum
 
-class Cor(Enum):
+class Cor(IntEnum):
     """Enum para as cores dos nós na árvore rubro-negra."""
-    VERMELHO = "R"
-    PRETO = "N"
+    # Valores inteiros: as comparações de cor no balanceamento são entre inteiros
+    PRETO = 0
+    VERMELHO = 1
+
+# Indica um argumento não informado em No.religar (None é um filho válido)
+_NAO_INFORMADO = object()
 
 class No:
     """
@@ -17,6 +23,18 @@ class No:
     permitindo acesso a estados anteriores sem duplicação completa da árvore.
     """
     
+    # Sem __dict__ por instância: menos memória por nó e acesso mais rápido
+    # aos atributos, que são lidos a cada passo de percurso e balanceamento.
+    __slots__ = (
+        'valor',
+        'versao_criacao',
+        '_versoes_cor',
+        '_cores',
+        '_versoes_filhos',
+        '_filhos',
+        'versao_fim',
+    )
+    
     def __init__(self, valor, cor=Cor.VERMELHO, versao_criacao=0):
         """
         Inicializa um novo nó.
@@ -29,17 +47,25 @@ class No:
         self.valor = valor
         self.versao_criacao = versao_criacao
         
-        # Histórico de cores por versão
-        self.historico_cores = {versao_criacao: cor}
-        
-        # Histórico de filhos por versão (esquerdo, direito)
-        self.historico_filhos = {versao_criacao: [None, None]}
+        # Histórico de cores: listas paralelas ordenadas por versão, de modo
+        # que a cor em vigor numa versão é encontrada por busca binária
+        self._versoes_cor = [versao_criacao]
+        self._cores = [cor]
         
-        # Histórico de pais por versão
-        self.historico_pais = {versao_criacao: None}
+        # Histórico de filhos, no mesmo formato. Cada registro é uma tupla
+        # (esquerdo, direito): imutável, pode ser devolvida sem cópia
+        self._versoes_filhos = [versao_criacao]
+        self._filhos = [(None, None)]
         
-        # Versão em que o nó foi removido (None se ainda ativo)
-        self.versao_remocao = None
+        # O nó está ativo nas versões do intervalo [versao_criacao, versao_fim).
+        # Enquanto não for removido, versao_fim é sys.maxsize, de modo que a
+        # verificação é sempre uma comparação dupla entre inteiros.
+        self.versao_fim = sys.maxsize
+    
+    @property
+    def versao_remocao(self):
+        """Versão em que o nó foi removido (None se ainda ativo)."""
+        return None if self.versao_fim == sys.maxsize else self.versao_fim
     
     def obter_cor(self, versao):
         """
@@ -51,8 +77,11 @@ class No:
         Returns:
             Cor: Cor do nó na versão especificada
         """
-        versao_valida = self._obter_versao_valida(versao, self.historico_cores)
-        return self.historico_cores.get(versao_valida, Cor.PRETO)
+        # A árvore lê quase sempre a versão atual, que é o último registro
+        if versao >= self._versoes_cor[-1]:
+            return self._cores[-1]
+        i = bisect_right(self._versoes_cor, versao) - 1
+        return self._cores[i] if i >= 0 else Cor.PRETO
     
     def definir_cor(self, cor, versao):
         """
@@ -62,7 +91,7 @@ class No:
             cor (Cor): Nova cor do nó
             versao (int): Versão para aplicar a mudança
         """
-        self.historico_cores[versao] = cor
+        _registrar(self._versoes_cor, self._cores, versao, cor)
     
     def obter_filho_esquerdo(self, versao):
         """
@@ -74,9 +103,10 @@ class No:
         Returns:
             No ou None: Filho esquerdo na versão especificada
         """
-        versao_valida = self._obter_versao_valida(versao, self.historico_filhos)
-        filhos = self.historico_filhos.get(versao_valida, [None, None])
-        return filhos[0]
+        if versao >= self._versoes_filhos[-1]:
+            return self._filhos[-1][0]
+        i = bisect_right(self._versoes_filhos, versao) - 1
+        return self._filhos[i][0] if i >= 0 else None
     
     def obter_filho_direito(self, versao):
         """
@@ -88,9 +118,10 @@ class No:
         Returns:
             No ou None: Filho direito na versão especificada
         """
-        versao_valida = self._obter_versao_valida(versao, self.historico_filhos)
-        filhos = self.historico_filhos.get(versao_valida, [None, None])
-        return filhos[1]
+        if versao >= self._versoes_filhos[-1]:
+            return self._filhos[-1][1]
+        i = bisect_right(self._versoes_filhos, versao) - 1
+        return self._filhos[i][1] if i >= 0 else None
     
     def definir_filho_esquerdo(self, filho, versao):
         """
@@ -100,8 +131,9 @@ class No:
             filho (No ou None): Novo filho esquerdo
             versao (int): Versão para aplicar a mudança
         """
-        filhos_atuais = self.obter_filhos(versao)
-        self.historico_filhos[versao] = [filho, filhos_atuais[1]]
+        _, filho_direito = self.obter_ambos_filhos(versao)
+        _registrar(self._versoes_filhos, self._filhos, versao,
+                   (filho, filho_direito))
     
     def definir_filho_direito(self, filho, versao):
         """
@@ -111,8 +143,24 @@ class No:
             filho (No ou None): Novo filho direito
             versao (int): Versão para aplicar a mudança
         """
-        filhos_atuais = self.obter_filhos(versao)
-        self.historico_filhos[versao] = [filhos_atuais[0], filho]
+        filho_esquerdo, _ = self.obter_ambos_filhos(versao)
+        _registrar(self._versoes_filhos, self._filhos, versao,
+                   (filho_esquerdo, filho))
+    
+    def obter_ambos_filhos(self, versao):
+        """
+        Obtém ambos os filhos do nó em uma versão com uma única consulta.
+        
+        Args:
+            versao (int): Versão desejada
+            
+        Returns:
+            tuple: Tupla (filho_esquerdo, filho_direito)
+        """
+        if versao >= self._versoes_filhos[-1]:
+            return self._filhos[-1]
+        i = bisect_right(self._versoes_filhos, versao) - 1
+        return self._filhos[i] if i >= 0 else (None, None)
     
     def obter_filhos(self, versao):
         """
@@ -122,10 +170,9 @@ class No:
             versao (int): Versão desejada
             
         Returns:
-            list: Lista com [filho_esquerdo, filho_direito]
+            tuple: Tupla (filho_esquerdo, filho_direito)
         """
-        versao_valida = self._obter_versao_valida(versao, self.historico_filhos)
-        return self.historico_filhos.get(versao_valida, [None, None]).copy()
+        return self.obter_ambos_filhos(versao)
     
     def definir_filhos(self, filho_esquerdo, filho_direito, versao):
         """
@@ -136,30 +183,33 @@ class No:
             filho_direito (No ou None): Novo filho direito
             versao (int): Versão para aplicar a mudança
         """
-        self.historico_filhos[versao] = [filho_esquerdo, filho_direito]
+        _registrar(self._versoes_filhos, self._filhos, versao,
+                   (filho_esquerdo, filho_direito))
     
-    def obter_pai(self, versao):
+    def religar(self, versao, *, cor=_NAO_INFORMADO, esquerdo=_NAO_INFORMADO,
+                direito=_NAO_INFORMADO):
         """
-        Obtém o pai do nó em uma versão específica.
+        Atualiza cor e filhos do nó em uma versão com uma única chamada.
         
-        Args:
-            versao (int): Versão desejada
-            
-        Returns:
-            No ou None: Pai na versão especificada
-        """
-        versao_valida = self._obter_versao_valida(versao, self.historico_pais)
-        return self.historico_pais.get(versao_valida)
-    
-    def definir_pai(self, pai, versao):
-        """
-        Define o pai do nó para uma versão específica.
+        Campos não informados mantêm o valor que já tinham na versão.
         
         Args:
-            pai (No ou None): Novo pai
-            versao (int): Versão para aplicar a mudança
+            versao (int): Versão para aplicar as mudanças
+            cor (Cor, opcional): Nova cor do nó
+            esquerdo (No ou None, opcional): Novo filho esquerdo
+            direito (No ou None, opcional): Novo filho direito
         """
-        self.historico_pais[versao] = pai
+        if cor is not _NAO_INFORMADO:
+            _registrar(self._versoes_cor, self._cores, versao, cor)
+        
+        if esquerdo is not _NAO_INFORMADO:
+            if direito is not _NAO_INFORMADO:
+                _registrar(self._versoes_filhos, self._filhos, versao,
+                           (esquerdo, direito))
+            else:
+                self.definir_filho_esquerdo(esquerdo, versao)
+        elif direito is not _NAO_INFORMADO:
+            self.definir_filho_direito(direito, versao)
     
     def esta_ativo(self, versao):
         """
@@ -171,8 +221,7 @@ class No:
         Returns:
             bool: True se o nó está ativo na versão
         """
-        return (versao >= self.versao_criacao and 
-                (self.versao_remocao is None or versao < self.versao_remocao))
+        return self.versao_criacao <= versao < self.versao_fim
     
     def remover(self, versao):
         """
@@ -181,21 +230,7 @@ class No:
         Args:
             versao (int): Versão em que o nó foi removido
         """
-        self.versao_remocao = versao
-    
-    def _obter_versao_valida(self, versao, historico):
-        """
-        Obtém a versão mais recente válida para um histórico específico.
-        
-        Args:
-            versao (int): Versão desejada
-            historico (dict): Histórico a consultar
-            
-        Returns:
-            int: Versão válida mais recente
-        """
-        versoes_disponiveis = [v for v in historico.keys() if v <= versao]
-        return max(versoes_disponiveis) if versoes_disponiveis else 0
+        self.versao_fim = versao
     
     def __str__(self):
         """Representação string do nó."""
@@ -203,4 +238,31 @@ class No:
     
     def __repr__(self):
         """Representação para debug do nó."""
-        return f"No(valor={self.valor}, versao_criacao={self.versao_criacao})"
\ No newline at end of file
+        return f"No(valor={self.valor}, versao_criacao={self.versao_criacao})"
+
+def _registrar(versoes, valores, versao, valor):
+    """
+    Registra um valor no histórico (listas paralelas ordenadas por versão).
+    
+    A árvore só escreve na versão mais recente do nó, então o caso comum é
+    sobrescrever o último registro ou acrescentar um novo ao final.
+    
+    Args:
+        versoes (list): Versões do histórico, em ordem crescente
+        valores (list): Valores correspondentes a cada versão
+        versao (int): Versão do registro
+        valor: Valor a registrar
+    """
+    ultima = versoes[-1]
+    if ultima == versao:
+        valores[-1] = valor
+    elif ultima < versao:
+        versoes.append(versao)
+        valores.append(valor)
+    else:
+        i = bisect_right(versoes, versao) - 1
+        if i >= 0 and versoes[i] == versao:
+            valores[i] = valor
+        else:
+            versoes.insert(i + 1, versao)
+            valores.insert(i + 1, valor)
@@ -2,8 +2,26 @@
 Módulo responsável por processar as operações da árvore rubro-negra.
 """
 
+import contextlib
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
 from arvore_rubro_negra import ArvoreRubroNegra
 
+# Tamanho do buffer dos arquivos de entrada e saída (1 MiB)
+TAMANHO_BUFFER = 1 << 20
+
+# Número de linhas de saída acumuladas antes de cada escrita
+TAMANHO_LOTE = 1000
+
+# Número máximo de resultados de SUC mantidos em cache
+LIMITE_CACHE_SUCESSOR = 4096
+# Número máximo de caracteres das linhas de IMP mantidas em cache (cada linha
+# tem o tamanho da versão impressa; linhas maiores que o limite não são guardadas)
+LIMITE_CARACTERES_CACHE_IMPRESSAO = 1 << 22
+
 class ProcessadorOperacoes:
     """
     Classe responsável por processar comandos e operações na árvore rubro-negra.
@@ -12,6 +30,20 @@ class ProcessadorOperacoes:
     def __init__(self):
         """Inicializa o processador com uma árvore vazia."""
         self.arvore = ArvoreRubroNegra()
+        # Tabela de despacho: código da operação -> (método que a processa,
+        # número de argumentos inteiros, formato esperado da linha)
+        self._despacho = {
+            "INC": (self._processar_inclusao, 1, "INC <valor>"),
+            "REM": (self._processar_remocao, 1, "REM <valor>"),
+            "SUC": (self._processar_sucessor, 2, "SUC <valor> <versao>"),
+            "IMP": (self._processar_impressao, 1, "IMP <versao>"),
+        }
+        # Resultados de consultas já feitas, em ordem de uso (LRU). Versões
+        # existentes nunca mudam, então as entradas não precisam ser
+        # invalidadas: as chaves usam a versão efetivamente consultada
+        self._cache_sucessor = OrderedDict()
+        self._cache_impressao = OrderedDict()
+        self._caracteres_cache_impressao = 0
     
     def processar_arquivo(self, caminho_entrada, caminho_saida):
         """
@@ -22,27 +54,74 @@ class ProcessadorOperacoes:
             caminho_saida (str): Caminho do arquivo de saída
         """
         try:
-            with open(caminho_entrada, 'r', encoding='utf-8') as arquivo_entrada:
-                linhas = arquivo_entrada.readlines()
-            
-            resultado = []
-            
-            for linha in linhas:
-                linha = linha.strip()
-                if linha:  # Ignora linhas vazias
-                    saida_operacao = self.processar_operacao(linha)
-                    if saida_operacao:
-                        resultado.extend(saida_operacao)
+            # A entrada é lida e a saída é gravada à medida que as operações
+            # são processadas, com buffers grandes nos dois arquivos. As linhas
+            # de saída são acumuladas em lotes de TAMANHO_LOTE e cada lote é
+            # gravado com uma única escrita
+            with open(caminho_entrada, 'r', encoding='utf-8',
+                      buffering=TAMANHO_BUFFER) as arquivo_entrada:
+                mesmo_arquivo = (os.path.exists(caminho_saida)
+                                 and os.path.samefile(caminho_entrada, caminho_saida))
+                
+                if not mesmo_arquivo:
+                    with open(caminho_saida, 'w', encoding='utf-8',
+                              buffering=TAMANHO_BUFFER) as arquivo_saida:
+                        self._gravar_saida(arquivo_entrada, arquivo_saida)
+                else:
+                    # Abrir a saída com 'w' apagaria a entrada antes da leitura:
+                    # a saída vai para um arquivo temporário ao lado do arquivo
+                    # real, que só o substitui quando toda a entrada foi lida
+                    destino = os.path.realpath(caminho_saida)
+                    descritor, caminho_temporario = tempfile.mkstemp(
+                        dir=os.path.dirname(destino), prefix='.saida-', suffix='.tmp')
+                    try:
+                        with os.fdopen(descritor, 'w', encoding='utf-8',
+                                       buffering=TAMANHO_BUFFER) as arquivo_saida:
+                            shutil.copymode(destino, caminho_temporario)
+                            self._gravar_saida(arquivo_entrada, arquivo_saida)
+                    except BaseException:
+                        _descartar(caminho_temporario)
+                        raise
             
-            with open(caminho_saida, 'w', encoding='utf-8') as arquivo_saida:
-                for linha_saida in resultado:
-                    arquivo_saida.write(linha_saida + '\n')
+            # A substituição é feita com a entrada já fechada (em alguns
+            # sistemas um arquivo aberto não pode ser substituído)
+            if mesmo_arquivo:
+                try:
+                    os.replace(caminho_temporario, destino)
+                except BaseException:
+                    _descartar(caminho_temporario)
+                    raise
                     
         except FileNotFoundError:
             print(f"Erro: Arquivo '{caminho_entrada}' não encontrado.")
         except Exception as e:
             print(f"Erro ao processar arquivo: {e}")
     
+    def _gravar_saida(self, arquivo_entrada, arquivo_saida):
+        """
+        Processa as operações de um arquivo aberto, gravando a saída em lotes.
+        
+        Args:
+            arquivo_entrada (file): Arquivo de entrada aberto para leitura
+            arquivo_saida (file): Arquivo de saída aberto para escrita
+        """
+        lote = []
+        processar_partes = self._processar_partes
+        
+        # Cada linha é dividida uma única vez; linhas vazias são ignoradas
+        for partes in map(str.split, arquivo_entrada):
+            if not partes:
+                continue
+            saida_operacao = processar_partes(partes)
+            if saida_operacao:
+                lote.extend(saida_operacao)
+                if len(lote) >= TAMANHO_LOTE:
+                    arquivo_saida.write('\n'.join(lote) + '\n')
+                    lote.clear()
+        
+        if lote:
+            arquivo_saida.write('\n'.join(lote) + '\n')
+    
     def processar_operacao(self, linha):
         """
         Processa uma linha de operação.
@@ -58,116 +137,138 @@ class ProcessadorOperacoes:
         if not partes:
             return None
         
-        operacao = partes[0].upper()
+        return self._processar_partes(partes)
+    
+    def _processar_partes(self, partes):
+        """
+        Processa uma operação já dividida em partes.
         
-        try:
-            if operacao == "INC":
-                return self._processar_inclusao(partes)
-            elif operacao == "REM":
-                return self._processar_remocao(partes)
-            elif operacao == "SUC":
-                return self._processar_sucessor(partes)
-            elif operacao == "IMP":
-                return self._processar_impressao(partes)
-            else:
+        Args:
+            partes (list): Partes não vazias da linha de comando
+            
+        Returns:
+            list ou None: Lista de linhas para o arquivo de saída, ou None se não há saída
+        """
+        # Os códigos costumam vir em maiúsculas: upper() só é chamado quando
+        # o código lido não está na tabela
+        entrada = self._despacho.get(partes[0])
+        
+        if entrada is None:
+            operacao = partes[0].upper()
+            entrada = self._despacho.get(operacao)
+            if entrada is None:
                 print(f"Operação desconhecida: {operacao}")
                 return None
-                
+        
+        processar, aridade, formato = entrada
+        
+        try:
+            return processar(*_decodificar_argumentos(partes, aridade, formato))
         except (ValueError, IndexError) as e:
-            print(f"Erro ao processar operação '{linha}': {e}")
+            print(f"Erro ao processar operação '{' '.join(partes)}': {e}")
             return None
     
-    def _processar_inclusao(self, partes):
+    def _processar_inclusao(self, valor):
         """
         Processa uma operação de inclusão.
         
         Args:
-            partes (list): Partes da linha de comando
+            valor (int): Valor a incluir
             
         Returns:
             None: Operação de inclusão não gera saída
         """
-        if len(partes) != 2:
-            raise ValueError("Operação INC deve ter formato: INC <valor>")
-        
-        valor = int(partes[1])
         self.arvore.incluir(valor)
         return None
     
-    def _processar_remocao(self, partes):
+    def _processar_remocao(self, valor):
         """
         Processa uma operação de remoção.
         
         Args:
-            partes (list): Partes da linha de comando
+            valor (int): Valor a remover
             
         Returns:
             None: Operação de remoção não gera saída
         """
-        if len(partes) != 2:
-            raise ValueError("Operação REM deve ter formato: REM <valor>")
-        
-        valor = int(partes[1])
         self.arvore.remover(valor)
         return None
     
-    def _processar_sucessor(self, partes):
+    def _processar_sucessor(self, valor, versao):
         """
         Processa uma operação de busca de sucessor.
         
         Args:
-            partes (list): Partes da linha de comando
+            valor (int): Valor de referência
+            versao (int): Versão consultada
             
         Returns:
             list: Linhas de saída para o arquivo
         """
-        if len(partes) != 3:
-            raise ValueError("Operação SUC deve ter formato: SUC <valor> <versao>")
-        
-        valor = int(partes[1])
-        versao = int(partes[2])
-        
-        sucessor = self.arvore.buscar_sucessor(valor, versao)
-        
         # Linha de eco da operação
         linha_operacao = f"SUC {valor} {versao}"
         
-        # Resultado do sucessor
-        if sucessor is not None:
-            linha_resultado = str(sucessor)
-        else:
-            linha_resultado = "infinito"
+        chave = (valor, self.arvore.resolver_versao(versao))
+        linha_resultado = _consultar_cache(self._cache_sucessor, chave)
+        
+        if linha_resultado is None:
+            sucessor = self.arvore.buscar_sucessor(valor, chave[1])
+            
+            # Resultado do sucessor
+            if sucessor is not None:
+                linha_resultado = str(sucessor)
+            else:
+                linha_resultado = "infinito"
+            
+            _guardar_cache(self._cache_sucessor, chave, linha_resultado,
+                           LIMITE_CACHE_SUCESSOR)
         
         return [linha_operacao, linha_resultado]
     
-    def _processar_impressao(self, partes):
+    def _processar_impressao(self, versao):
         """
         Processa uma operação de impressão.
         
         Args:
-            partes (list): Partes da linha de comando
+            versao (int): Versão a imprimir
             
         Returns:
             list: Linhas de saída para o arquivo
         """
-        if len(partes) != 2:
-            raise ValueError("Operação IMP deve ter formato: IMP <versao>")
-        
-        versao = int(partes[1])
-        
-        elementos = self.arvore.imprimir_arvore(versao)
-        
         # Linha de eco da operação
         linha_operacao = f"IMP {versao}"
         
-        # Elementos da árvore em ordem
-        if elementos:
-            linha_elementos = " ".join(elementos)
-        else:
-            linha_elementos = ""
+        versao_efetiva = self.arvore.resolver_versao(versao)
+        linha_elementos = _consultar_cache(self._cache_impressao, versao_efetiva)
+        
+        if linha_elementos is None:
+            # Elementos da árvore em ordem, unidos à medida que são gerados
+            linha_elementos = " ".join(self.arvore.imprimir_arvore_iter(versao_efetiva))
+            self._guardar_impressao(versao_efetiva, linha_elementos)
         
         return [linha_operacao, linha_elementos]
     
+    def _guardar_impressao(self, versao, linha_elementos):
+        """
+        Guarda a linha de IMP de uma versão no cache, limitado por caracteres.
+        
+        As linhas usadas há mais tempo são descartadas até que o total volte a
+        caber em LIMITE_CARACTERES_CACHE_IMPRESSAO.
+        
+        Args:
+            versao (int): Versão efetivamente impressa
+            linha_elementos (str): Elementos da versão unidos por espaço
+        """
+        tamanho = len(linha_elementos)
+        if tamanho > LIMITE_CARACTERES_CACHE_IMPRESSAO:
+            return
+        
+        self._cache_impressao[versao] = linha_elementos
+        self._caracteres_cache_impressao += tamanho
+        while self._caracteres_cache_impressao > LIMITE_CARACTERES_CACHE_IMPRESSAO:
+            _, descartada = self._cache_impressao.popitem(last=False)
+            self._caracteres_cache_impressao -= len(descartada)
+    
     def obter_versao_atual(self):
         """
         Obtém a versão atual da árvore.
@@ -187,4 +288,64 @@ class ProcessadorOperacoes:
         return {
             "versao_atual": self.arvore.versao_atual,
             "total_versoes": self.arvore.versao_atual #+ 1
-        }
\ No newline at end of file
+        }
+
+def _decodificar_argumentos(partes, aridade, formato):
+    """
+    Converte os argumentos de uma operação em inteiros, validando a quantidade.
+    
+    Args:
+        partes (list): Partes da linha de comando (código e argumentos)
+        aridade (int): Número de argumentos esperado
+        formato (str): Formato esperado da linha, usado na mensagem de erro
+        
+    Returns:
+        list: Argumentos convertidos para int
+        
+    Raises:
+        ValueError: Se a quantidade de argumentos for diferente da esperada
+            ou algum argumento não for um inteiro
+    """
+    if len(partes) != aridade + 1:
+        raise ValueError(f"Operação {formato.split()[0]} deve ter formato: {formato}")
+    return [int(parte) for parte in partes[1:]]
+
+def _descartar(caminho_temporario):
+    """
+    Remove um arquivo temporário de saída, ignorando se ele já não existir.
+    
+    Args:
+        caminho_temporario (str): Caminho do arquivo temporário
+    """
+    with contextlib.suppress(OSError):
+        os.remove(caminho_temporario)
+
+def _consultar_cache(cache, chave):
+    """
+    Consulta um cache LRU, marcando a entrada encontrada como a mais recente.
+    
+    Args:
+        cache (OrderedDict): Cache consultado
+        chave: Chave da consulta
+        
+    Returns:
+        str ou None: Valor guardado, ou None se a chave não estiver no cache
+    """
+    valor = cache.get(chave)
+    if valor is not None:
+        cache.move_to_end(chave)
+    return valor
+
+def _guardar_cache(cache, chave, valor, limite):
+    """
+    Guarda um valor num cache LRU, descartando a entrada menos usada se cheio.
+    
+    Args:
+        cache (OrderedDict): Cache atualizado
+        chave: Chave do valor
+        valor (str): Valor a guardar
+        limite (int): Número máximo de entradas do cache
+    """
+    cache[chave] = valor
+    if len(cache) > limite:
+        cache.popitem(last=False)
@@ -3,13 +3,16 @@ Testes unitários para a árvore rubro-negra com persistência parcial.
 """
 
 import unittest
+from unittest import mock
 import sys
 import os
+import tempfile
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from no import No, Cor
 from arvore_rubro_negra import ArvoreRubroNegra
+import processador_operacoes
 from processador_operacoes import ProcessadorOperacoes
 
 class TestNo(unittest.TestCase):
@@ -45,6 +48,32 @@ class TestNo(unittest.TestCase):
         self.assertEqual(self.no.obter_filho_esquerdo(0), filho_esq)
         self.assertEqual(self.no.obter_filho_direito(0), filho_dir)
     
+    def test_religar(self):
+        """Testa a atualização de vários campos com uma única chamada."""
+        filho_esq = No(5, Cor.PRETO, 0)
+        filho_dir = No(15, Cor.PRETO, 0)
+        self.no.definir_filhos(filho_esq, None, 0)
+        
+        self.no.religar(1, cor=Cor.PRETO, direito=filho_dir)
+        
+        self.assertEqual(self.no.obter_cor(1), Cor.PRETO)
+        self.assertEqual(self.no.obter_filho_esquerdo(1), filho_esq)
+        self.assertEqual(self.no.obter_filho_direito(1), filho_dir)
+        # Versão anterior permanece inalterada
+        self.assertEqual(self.no.obter_cor(0), Cor.VERMELHO)
+        self.assertIsNone(self.no.obter_filho_direito(0))
+    
+    def test_obter_ambos_filhos(self):
+        """Testa a leitura dos dois filhos com uma única consulta."""
+        filho_esq = No(5, Cor.PRETO, 0)
+        filho_dir = No(15, Cor.PRETO, 0)
+        self.no.definir_filhos(filho_esq, None, 0)
+        self.no.definir_filho_direito(filho_dir, 2)
+        
+        self.assertEqual(self.no.obter_ambos_filhos(0), (filho_esq, None))
+        self.assertEqual(self.no.obter_ambos_filhos(1), (filho_esq, None))
+        self.assertEqual(self.no.obter_ambos_filhos(2), (filho_esq, filho_dir))
+    
     def test_remocao_no(self):
         """Testa a remoção do nó."""
         self.assertTrue(self.no.esta_ativo(0))
@@ -111,6 +140,116 @@ class TestArvoreRubroNegra(unittest.TestCase):
         self.assertEqual(self.arvore.buscar_sucessor(18), None)  # Não tem sucessor
         self.assertEqual(self.arvore.buscar_sucessor(0), 3)     # Menor que todos
     
+    def test_busca_sucessor_versao_anterior(self):
+        """Testa busca de sucessor em versões anteriores após novas modificações."""
+        valores = [10, 5, 15, 3, 7, 12, 18]
+        
+        for valor in valores:
+            self.arvore.incluir(valor)
+        self.arvore.remover(10)
+        self.arvore.incluir(11)
+        
+        # Versão 4 contém apenas 10, 5, 15 e 3
+        self.assertEqual(self.arvore.buscar_sucessor(4, 4), 5)
+        self.assertEqual(self.arvore.buscar_sucessor(6, 4), 10)
+        self.assertEqual(self.arvore.buscar_sucessor(15, 4), None)
+        # Versão 8 não contém mais o 10
+        self.assertEqual(self.arvore.buscar_sucessor(8, 8), 12)
+        self.assertEqual(self.arvore.buscar_sucessor(8, 9), 11)
+    
+    def test_materializacao_versoes_antigas(self):
+        """Testa que apenas versões antigas consultadas com frequência são materializadas."""
+        for valor in range(20):
+            self.arvore.incluir(valor)
+        
+        # A versão só é materializada ao atingir o limiar de consultas
+        limiar = self.arvore._limiar_materializacao(10)
+        for _ in range(limiar - 1):
+            self.assertEqual(self.arvore.buscar_sucessor(5, 10), 6)
+        self.assertNotIn(10, self.arvore._instantaneos)
+        self.assertEqual(self.arvore.buscar_sucessor(5, 10), 6)
+        self.assertIn(10, self.arvore._instantaneos)
+        self.assertEqual(self.arvore.buscar_sucessor(5, 10), 6)
+        
+        # A versão atual nunca é materializada
+        for _ in range(3):
+            self.arvore.buscar_sucessor(5)
+        self.assertNotIn(20, self.arvore._instantaneos)
+        
+        # O número de versões materializadas é limitado
+        for versao in range(1, 20):
+            for _ in range(self.arvore._limiar_materializacao(versao)):
+                self.assertEqual(self.arvore.buscar_sucessor(-1, versao), 0)
+                self.assertIsNone(self.arvore.buscar_sucessor(versao, versao))
+        self.assertEqual(len(self.arvore._instantaneos), ArvoreRubroNegra.LIMITE_INSTANTANEOS)
+    
+    def test_materializacao_amortizada(self):
+        """Testa que materializações de versões antigas são pagas pelas consultas."""
+        for valor in range(64):
+            self.arvore.incluir(valor)
+        
+        materializacoes = []
+        materializar = self.arvore._materializar
+        def contar_materializacao(versao):
+            materializacoes.append(versao)
+            return materializar(versao)
+        self.arvore._materializar = contar_materializacao
+        
+        # Percorrer ciclicamente mais versões do que cabem em _instantaneos
+        versoes = range(40, 40 + ArvoreRubroNegra.LIMITE_INSTANTANEOS + 1)
+        consultas = 0
+        for rodada in range(300):
+            for versao in versoes:
+                self.assertEqual(self.arvore.buscar_sucessor(rodada % 64, versao),
+                                 rodada % 64 + 1 if rodada % 64 + 1 < versao else None)
+                consultas += 1
+        
+        # Cada materialização é precedida por um limiar inteiro de consultas
+        # respondidas nos nós, mesmo quando a versão foi descartada antes
+        limiar = min(self.arvore._limiar_materializacao(versao) for versao in versoes)
+        self.assertGreater(len(materializacoes), 0)
+        self.assertLessEqual(len(materializacoes), consultas // limiar)
+        
+        # Descartar uma versão materializada não apaga sua contagem
+        self.assertTrue(all(versao in self.arvore._acessos for versao in versoes))
+    
+    def test_contagens_limitadas(self):
+        """Testa que as contagens de consultas a versões antigas são limitadas."""
+        for valor in range(ArvoreRubroNegra.LIMITE_CONTAGENS + 50):
+            self.arvore.incluir(valor)
+        
+        for versao in range(1, self.arvore.versao_atual):
+            self.arvore.buscar_sucessor(0, versao)
+        
+        self.assertEqual(len(self.arvore._acessos), ArvoreRubroNegra.LIMITE_CONTAGENS)
+        # As contagens mantidas são as das versões consultadas por último
+        self.assertIn(self.arvore.versao_atual - 1, self.arvore._acessos)
+        self.assertNotIn(1, self.arvore._acessos)
+    
+    def test_tamanhos_por_versao(self):
+        """Testa o número de nós registrado para cada versão."""
+        for valor in [10, 5, 10, 15]:
+            self.arvore.incluir(valor)
+        self.arvore.remover(7)
+        self.arvore.remover(5)
+        
+        # Incluir um valor repetido ou remover um ausente não muda o tamanho
+        self.assertEqual(self.arvore.tamanhos, [0, 1, 2, 2, 3, 3, 2])
+    
+    def test_versao_fora_do_intervalo(self):
+        """Testa que versões inexistentes consultam a versão atual."""
+        for valor in [10, 5, 15]:
+            self.arvore.incluir(valor)
+        
+        atual = self.arvore.imprimir_arvore()
+        self.assertEqual(self.arvore.imprimir_arvore(-1), atual)
+        self.assertEqual(self.arvore.imprimir_arvore(-7), atual)
+        self.assertEqual(self.arvore.imprimir_arvore(50), atual)
+        self.assertEqual(self.arvore.imprimir_arvore(None), atual)
+        self.assertEqual(self.arvore.buscar_sucessor(7, None), 10)
+        self.assertEqual(self.arvore.buscar_sucessor(5, -2), 10)
+        self.assertEqual(self.arvore.buscar_sucessor(10, 50), 15)
+    
     def test_remocao_simples(self):
         """Testa remoção de elementos."""
         # Inserir elementos
@@ -160,6 +299,32 @@ class TestArvoreRubroNegra(unittest.TestCase):
         valores_v3 = [int(item.split(',')[0]) for item in resultado_v3]
         self.assertEqual(sorted(valores_v3), [5, 10, 15])
 
+    def test_mais_de_cem_versoes(self):
+        """Testa que o número de versões não é limitado."""
+        for valor in range(150):
+            self.arvore.incluir(valor)
+        
+        self.assertEqual(self.arvore.versao_atual, 150)
+        self.assertEqual(len(self.arvore.imprimir_arvore()), 150)
+        self.assertEqual(self.arvore.buscar_sucessor(-1), 0)
+        self.assertEqual(self.arvore.buscar_sucessor(-1, 100), 0)
+    
+    def test_remocao_com_dois_filhos_preserva_versoes(self):
+        """Testa que remover um nó com dois filhos não altera versões anteriores."""
+        for valor in [20, 10, 30, 25]:
+            self.arvore.incluir(valor)
+        versao_antes_remocao = self.arvore.versao_atual
+        
+        self.arvore.remover(20)
+        
+        valores_atuais = [int(item.split(',')[0]) for item in self.arvore.imprimir_arvore()]
+        self.assertEqual(valores_atuais, [10, 25, 30])
+        
+        resultado_anterior = self.arvore.imprimir_arvore(versao_antes_remocao)
+        valores_anteriores = [int(item.split(',')[0]) for item in resultado_anterior]
+        self.assertEqual(valores_anteriores, [10, 20, 25, 30])
+        self.assertEqual(self.arvore.buscar_sucessor(15, versao_antes_remocao), 20)
+
 class TestProcessadorOperacoes(unittest.TestCase):
     """Testes para a classe ProcessadorOperacoes."""
     
@@ -218,6 +383,137 @@ class TestProcessadorOperacoes(unittest.TestCase):
         resultado = self.processador.processar_operacao("INC")
         self.assertIsNone(resultado)
 
+    def test_cache_consultas(self):
+        """Testa que consultas repetidas seguem a versão efetivamente consultada."""
+        self.processador.processar_operacao("INC 10")
+        self.processador.processar_operacao("INC 5")
+        
+        # Versão fora do intervalo indica a versão atual (2)
+        self.assertEqual(self.processador.processar_operacao("SUC 6 99"), ["SUC 6 99", "10"])
+        self.assertEqual(self.processador.processar_operacao("IMP 99"), ["IMP 99", "5,1,R 10,0,N"])
+        
+        self.processador.processar_operacao("INC 7")
+        
+        # A versão atual passou a ser 3; a versão 2 continua igual
+        self.assertEqual(self.processador.processar_operacao("SUC 6 99"), ["SUC 6 99", "7"])
+        self.assertEqual(self.processador.processar_operacao("SUC 6 2"), ["SUC 6 2", "10"])
+        self.assertEqual(self.processador.processar_operacao("IMP 2"), ["IMP 2", "5,1,R 10,0,N"])
+        self.assertEqual(self.processador.processar_operacao("IMP 99"),
+                         ["IMP 99", "5,1,N 7,0,N 10,1,N"])
+    
+    def test_cache_impressao_limitado(self):
+        """Testa o descarte de linhas de IMP quando o cache excede o limite de caracteres."""
+        for valor in [10, 5, 15]:
+            self.processador.processar_operacao(f"INC {valor}")
+        
+        with mock.patch.object(processador_operacoes, "LIMITE_CARACTERES_CACHE_IMPRESSAO", 30):
+            self.processador.processar_operacao("IMP 1")   # "10,0,N" (6)
+            self.processador.processar_operacao("IMP 2")   # "5,1,R 10,0,N" (12)
+            self.assertEqual(list(self.processador._cache_impressao), [1, 2])
+            
+            # A linha da versão 3 (19) só cabe descartando as duas anteriores
+            self.processador.processar_operacao("IMP 3")
+            self.assertEqual(list(self.processador._cache_impressao), [3])
+            self.assertEqual(self.processador._caracteres_cache_impressao, 19)
+            
+            # Versões descartadas continuam sendo impressas corretamente
+            self.assertEqual(self.processador.processar_operacao("IMP 1"), ["IMP 1", "10,0,N"])
+            self.assertEqual(list(self.processador._cache_impressao), [3, 1])
+        
+        # Linhas maiores que o limite não são guardadas
+        with mock.patch.object(processador_operacoes, "LIMITE_CARACTERES_CACHE_IMPRESSAO", 10):
+            processador = ProcessadorOperacoes()
+            for valor in [10, 5]:
+                processador.processar_operacao(f"INC {valor}")
+            self.assertEqual(processador.processar_operacao("IMP 2"), ["IMP 2", "5,1,R 10,0,N"])
+            self.assertEqual(len(processador._cache_impressao), 0)
+    
+    def test_processar_arquivo(self):
+        """Testa o processamento de um arquivo com saída gravada em lotes."""
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho_entrada = os.path.join(diretorio, "entrada.txt")
+            caminho_saida = os.path.join(diretorio, "saida.txt")
+            
+            # Saída maior que um lote, com linhas vazias e códigos minúsculos
+            linhas = ["INC 10", "", "inc 5", "   "]
+            linhas += ["SUC 6 2"] * 1200 + ["IMP 2"]
+            with open(caminho_entrada, 'w', encoding='utf-8') as arquivo:
+                arquivo.write("\n".join(linhas) + "\n")
+            
+            self.processador.processar_arquivo(caminho_entrada, caminho_saida)
+            
+            with open(caminho_saida, encoding='utf-8') as arquivo:
+                saida = arquivo.read().splitlines()
+        
+        self.assertEqual(len(saida), 2 * 1200 + 2)
+        self.assertEqual(saida[:2], ["SUC 6 2", "10"])
+        self.assertEqual(saida[-2:], ["IMP 2", "5,1,R 10,0,N"])
+
+    def test_processar_arquivo_mesmo_caminho(self):
+        """Testa o uso do mesmo arquivo como entrada e saída."""
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, "operacoes.txt")
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write("INC 5\nINC 3\nIMP 2\n")
+            
+            self.processador.processar_arquivo(caminho, caminho)
+            
+            with open(caminho, encoding='utf-8') as arquivo:
+                saida = arquivo.read().splitlines()
+            arquivos = os.listdir(diretorio)
+        
+        self.assertEqual(saida, ["IMP 2", "3,1,R 5,0,N"])
+        self.assertEqual(arquivos, ["operacoes.txt"])
+    
+    def test_processar_arquivo_mesmo_caminho_falha(self):
+        """Testa que uma falha no meio da entrada preserva o arquivo de entrada e saída."""
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, "operacoes.txt")
+            
+            # Linha com bytes inválidos em UTF-8 depois de operações válidas
+            conteudo = b"INC 5\nIMP 1\n" * 2000 + b"INC \xff\n"
+            with open(caminho, 'wb') as arquivo:
+                arquivo.write(conteudo)
+            
+            self.processador.processar_arquivo(caminho, caminho)
+            
+            with open(caminho, 'rb') as arquivo:
+                preservado = arquivo.read()
+            arquivos = os.listdir(diretorio)
+        
+        self.assertEqual(preservado, conteudo)
+        self.assertEqual(arquivos, ["operacoes.txt"])
+    
+    def test_processar_arquivo_saida_por_link_simbolico(self):
+        """Testa que a saída é gravada no destino de um link simbólico."""
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho_entrada = os.path.join(diretorio, "entrada.txt")
+            caminho_destino = os.path.join(diretorio, "destino.txt")
+            caminho_link = os.path.join(diretorio, "link.txt")
+            with open(caminho_entrada, 'w', encoding='utf-8') as arquivo:
+                arquivo.write("INC 5\nINC 3\nIMP 2\n")
+            with open(caminho_destino, 'w', encoding='utf-8') as arquivo:
+                arquivo.write("anterior\n")
+            os.symlink(caminho_destino, caminho_link)
+            
+            self.processador.processar_arquivo(caminho_entrada, caminho_link)
+            
+            self.assertTrue(os.path.islink(caminho_link))
+            with open(caminho_destino, encoding='utf-8') as arquivo:
+                self.assertEqual(arquivo.read().splitlines(), ["IMP 2", "3,1,R 5,0,N"])
+            
+            # Entrada e saída iguais através do link: o link também é mantido
+            os.remove(caminho_link)
+            os.symlink(caminho_entrada, caminho_link)
+            
+            ProcessadorOperacoes().processar_arquivo(caminho_entrada, caminho_link)
+            
+            self.assertTrue(os.path.islink(caminho_link))
+            with open(caminho_entrada, encoding='utf-8') as arquivo:
+                self.assertEqual(arquivo.read().splitlines(), ["IMP 2", "3,1,R 5,0,N"])
+            self.assertEqual(sorted(os.listdir(diretorio)),
+                             ["destino.txt", "entrada.txt", "link.txt"])
+
 class TestIntegracao(unittest.TestCase):
     """Testes de integração do sistema completo."""
     
@@ -281,8 +577,19 @@ class TestIntegracao(unittest.TestCase):
         self.assertNotIn("25", valores_v5)
 
 def executar_testes():
-    """Executa todos os testes unitários."""
-    unittest.main(verbosity=2)
+    """
+    Executa todos os testes unitários.
+    
+    Com pytest e pytest-xdist instalados, os testes são distribuídos entre
+    processos (pytest -n auto); caso contrário, são executados com unittest.
+    """
+    try:
+        import pytest
+        import xdist  # noqa: F401 (apenas verifica se o plugin está instalado)
+    except ImportError:
+        unittest.main(verbosity=2)
+    else:
+        sys.exit(pytest.main(["-n", "auto", "-q", __file__]))
 
 if __name__ == "__main__":
     executar_testes()
\ No newline at end of file